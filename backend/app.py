@@ -1,33 +1,49 @@
 import asyncio
-import json
 import logging
 import os
 import re
 from dataclasses import dataclass
+from functools import lru_cache
+from string import Formatter
 from typing import Annotated, Any, Literal
 
+import orjson
 from diskcache import Cache
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field, ConfigDict
 
-from livekit import agents
-from livekit.agents import AgentSession, Agent, ChatMessage, ChatContext, room_io, function_tool, RunContext, ToolError
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
+
+from livekit import agents, rtc
+from livekit.agents import AgentSession, Agent, APIConnectOptions, ChatMessage, ChatContext, room_io, function_tool, RunContext, ToolError
 from livekit.agents.llm import ChatContent  # noqa
 from livekit.plugins import openai, silero, noise_cancellation
 from xaitts import TTS as XaiTTS
 from xaitts_cloning import VoiceCloneTTS
 from livekit.plugins.turn_detector.english import EnglishModel as EnglishTurnDetector
 
+try:  # optional: libuv-backed event loop for the socket-heavy RTC/LLM/TTS traffic
+    import uvloop
+except ImportError:  # not installed / Windows
+    uvloop = None
+
 USE_VOICE_CLONE = True
 CLONE_VOICES = {0: "romaco", 1: "yuri"}  # persona_id → clone voice
 
 
 # Helper to assign voices per persona id by gender
 def select_voice(persona: "Persona") -> str:
-    options = VOICES.get(persona.gender, [])
-    return options[persona.id % len(options)].lower() if options else "eve"
+    options = VOICES_LOWER.get(persona.gender)
+    return options[persona.id % len(options)] if options else "eve"
+
 
-from research import research_agent, EventType
+def create_tts(persona: "Persona", voice: str) -> XaiTTS | VoiceCloneTTS:
+    """TTS client for a persona; built once per session and shared by its agents."""
+    if USE_VOICE_CLONE and persona.id in CLONE_VOICES:
+        return VoiceCloneTTS(voice=CLONE_VOICES[persona.id], api_key=XAI_API_KEY)
+    return XaiTTS(voice=voice, api_key=XAI_API_KEY)
+
+from research import research_agent, EventType, close_client as close_research_client
 
 # DROCH
 # - [ ] voices
@@ -44,13 +60,26 @@ DebateChatMessage.model_rebuild()
 
 load_dotenv(".env")
 
+XAI_API_KEY = os.environ.get("XAI_API_KEY")
+if not XAI_API_KEY:
+    raise ValueError("XAI_API_KEY not found")
+
+# Set at import so both the CLI process and the job processes that import this module
+# get uvloop from asyncio.new_event_loop().
+if uvloop is not None:
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
 VOICES = {
-    "female": ["Ara", "Eve", "Una"],
-    "male": ["Rex", "Sal", "Leo"],
+    "female": ("Ara", "Eve", "Una"),
+    "male": ("Rex", "Sal", "Leo"),
 }
+VOICES_LOWER = {gender: tuple(v.lower() for v in voices) for gender, voices in VOICES.items()}
 
+# Everything that changes mid-debate (topic, who is present, hot takes) sits in the
+# "Current State" tail, so the persona-specific prefix above it stays byte-identical
+# across turns and the provider's prompt cache keeps hitting.
 AGENT_INSTRUCTIONS = """
-You are {persona_name} in a debate on: "{topic}"
+You are {persona_name} in a debate; the current topic is given under "Current State" below.
 If the user shifts topics, immediately pivot to the latest user subject and drop earlier contexts.
 
 Your stance
@@ -58,10 +87,9 @@ Your stance
 {persona_prompt}
 ```
 
-Other participants: {other_personas}
-
 ## VOICE RULES
 - ONE clause, MAX 10 words. No fluff.
+- Never hand the turn to the user; they jump in when they want.
 - Sound like a real person arguing, not a chatbot "considering perspectives"
 - Use contractions, interruptions, attitude. "Look," "Oh please," "That's literally—"
 
@@ -122,6 +150,10 @@ When to act:
 
 Quality bar: Would you tweet this? If not, refine or cut.
 
+## Current State
+Debate topic: "{topic}"
+Other participants: {other_personas}
+
 Current Hot Takes:
 {hot_takes}
 """
@@ -171,6 +203,28 @@ Ban: passionate, innovative, holistic, synergy, leverage, ecosystem, "the power
 These are people with opinions forged by experience, not downloaded from think tanks.
 """.strip()
 
+def compile_template(template: str, **static: str) -> tuple[tuple[str, str | None], ...]:
+    """Pre-split a str.format template into (literal, field) pairs, folding in static fields."""
+    parts = []
+    literal = ""
+    for text, field, _, _ in Formatter().parse(template):
+        literal += text
+        if field is None:
+            continue
+        if field in static:
+            literal += static[field]
+        else:
+            parts.append((literal, field))
+            literal = ""
+    parts.append((literal, None))
+    return tuple(parts)
+
+
+def render_template(parts: tuple[tuple[str, str | None], ...], **values: str) -> str:
+    """Fill the remaining fields of a template prepared by compile_template."""
+    return "".join(literal + values[field] if field else literal for literal, field in parts)
+
+
 def clean_topic_text(text: str) -> str:
     """Extract a concise topic from a raw user utterance."""
     t = (text or "").strip()
@@ -186,7 +240,7 @@ def clean_topic_text(text: str) -> str:
     return t or "General discussion"
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Persona:
     """A debate persona with a unique perspective."""
     id: int
@@ -196,6 +250,18 @@ class Persona:
     description: str
 
 
+@dataclass(slots=True, frozen=True)
+class SessionSettings:
+    """Job metadata, parsed once when the session starts."""
+    topic: str | None
+    genders: tuple[str, ...]
+
+    @classmethod
+    def from_metadata(cls, metadata: str | None) -> "SessionSettings":
+        raw: dict[str, Any] = orjson.loads(metadata or "{}")
+        return cls(topic=raw.get("topic"), genders=tuple(raw.get("genders", ("female", "female"))))
+
+
 class PersonaSchema(BaseModel):
     name: str = Field(description="Human first name matching gender (e.g. Sarah, Marcus)")
     prompt: str = Field(description="System prompt for LLM: persona's stance on topic, argumentation style, rhetorical tactics (3-5 sentences)")
@@ -203,7 +269,10 @@ class PersonaSchema(BaseModel):
 
 
 MAX_HOT_TAKES = 4
+NOTIFY_RPC_TIMEOUT = 0.5  # seconds per attempt for cosmetic UI notifications
+NOTIFY_RPC_RETRY_DELAY = 0.1  # seconds before the single retry of a failed UI notification
 MIN_TURNS_BEFORE_USER = 2  # encourage agents to volley before returning to the user
+NOISE_CANCELLATION = noise_cancellation.BVC()  # immutable options; the model itself is loaded natively
 
 
 class DebatePersonasSchema(BaseModel):
@@ -223,10 +292,11 @@ class AvatarToolCall(BaseModel):
 
 
 
+@lru_cache(maxsize=256)  # in-process layer; keeps repeat topics off the disk cache
 # @Cache(".cache/personas").memoize()
-def generate_debating_personas(topic: str, genders: tuple[str, ...]) -> list[Persona]:
+def generate_debating_personas(topic: str, genders: tuple[str, ...]) -> tuple[Persona, ...]:
     """Return a small, fixed roster of witty personas for the demo."""
-    return [
+    return (
         Persona(
             id=0,
             name="Raven",
@@ -250,15 +320,46 @@ def generate_debating_personas(topic: str, genders: tuple[str, ...]) -> list[Per
             ),
             description="Cuts through hype, protects human cost, and demands proof without repeating herself.",
         ),
-    ]
+    )
+
+
+def is_transient_rpc_error(exc: BaseException) -> bool:
+    """Worth retrying: transport hiccups, not app errors or a missing recipient."""
+    if isinstance(exc, rtc.RpcError):
+        return exc.code in (rtc.RpcError.ErrorCode.CONNECTION_TIMEOUT, rtc.RpcError.ErrorCode.SEND_FAILED)
+    return isinstance(exc, (ConnectionError, TimeoutError))
+
+
+WARMUP_CONN_OPTIONS = APIConnectOptions(max_retry=0, timeout=5.0)  # warm-ups are best-effort
+
+
+async def warm_up_connections(llm: openai.LLM, stt: openai.STT):
+    """Open the keep-alive HTTPS connections to x.ai before the first real turn needs them."""
+
+    async def _warm_llm():
+        chat_ctx = ChatContext.empty()
+        chat_ctx.add_message(role="user", content="ok")
+        async with llm.chat(
+            chat_ctx=chat_ctx, conn_options=WARMUP_CONN_OPTIONS, extra_kwargs={"max_completion_tokens": 1}
+        ) as stream:
+            async for _ in stream:
+                pass
+
+    async def _warm_stt():
+        silence = rtc.AudioFrame(bytes(3200), sample_rate=16000, num_channels=1, samples_per_channel=1600)
+        await stt.recognize(silence, conn_options=WARMUP_CONN_OPTIONS)
+
+    for name, result in zip(("llm", "stt"), await asyncio.gather(_warm_llm(), _warm_stt(), return_exceptions=True)):
+        if isinstance(result, BaseException):
+            logging.debug("%s warm-up failed: %s", name, result)
 
 
 ### ============================================================ ###
 
 
 class DebateAgent(Agent):
-    SUPPORTED_AVATAR_IDS = {"assistant", "local"}
-    SUPPORTED_EXPRESSIONS = {"smile", "surprised", "concerned", "wink", "laugh"}
+    SUPPORTED_AVATAR_IDS = frozenset({"assistant", "local"})
+    SUPPORTED_EXPRESSIONS = frozenset({"smile", "surprised", "concerned", "wink", "laugh"})
     EXPRESSION_SYNONYMS = {
         "happy": "smile",
         "serious": "concerned",
@@ -268,11 +369,14 @@ class DebateAgent(Agent):
         "winking": "wink",
         "skeptical": "concerned",
     }
+    # Every accepted spelling (canonical or synonym) → canonical preset, one lookup per call.
+    PRESET_CANON = {**{p: p for p in SUPPORTED_EXPRESSIONS}, **EXPRESSION_SYNONYMS}
+
     def __init__(
         self,
         topic: str,
         persona: Persona,
-        all_personas: list[Persona],
+        all_personas: tuple[Persona, ...],
         session: AgentSession,
         first: bool = False,
     ):
@@ -281,15 +385,12 @@ class DebateAgent(Agent):
         self.all_personas = all_personas
         self._session = session
         self.first = first
-
-        if USE_VOICE_CLONE and persona.id in CLONE_VOICES:
-            tts_instance = VoiceCloneTTS(voice=CLONE_VOICES[persona.id])
-        else:
-            tts_instance = XaiTTS(voice=self._session.voices.get(persona.id, select_voice(persona)))
+        self._others = tuple(p for p in all_personas if p.name != persona.name)
+        self._speaker_chosen = False  # set when give_turn_to_next_speaker ran during the current reply
 
         super().__init__(
             instructions=self._build_instructions(),
-            tts=tts_instance,
+            tts=self._session.tts_by_id[persona.id],
         )
 
     def _hot_takes_to_prompt(self) -> str:
@@ -299,21 +400,37 @@ class DebateAgent(Agent):
         return "\n".join(f"- {t}" for t in takes)
 
     def _build_instructions(self) -> str:
-        instructions = AGENT_INSTRUCTIONS.format(
-            persona_name=self.persona.name,
-            topic=self._session.current_topic or self.topic,
-            persona_prompt=self.persona.prompt,
-            other_personas=", ".join([p.name for p in self.all_personas if p.name != self.persona.name and p.id not in self._session.researching_agents]) + ", and User",
+        topic = self._session.current_topic or self.topic
+        researching = self._session.researching_agents
+        my_research = self._session.research_results.get(self.persona.id)
+
+        # Rendering is a multi-KB format; reuse it until an input actually changes.
+        # Cached per persona on the session, so it survives the agent swap on every handoff.
+        research_key = (my_research['take'], my_research['explanation']) if my_research else None
+        key = (topic, tuple(self._session.hot_takes), frozenset(researching), research_key)
+        cached = self._session.instructions_cache.get(self.persona.id)
+        if cached and cached[0] == key:
+            return cached[1]
+
+        instructions = render_template(
+            self._session.instruction_parts[self.persona.id],
+            topic=topic,
+            other_personas=(
+                ", ".join(p.name for p in self._others if p.id not in researching) + ", and User"
+                if researching
+                else self._session.other_personas[self.persona.id]
+            ),
             hot_takes=self._hot_takes_to_prompt(),
         )
 
         # Add research results if this agent has fresh findings
-        if my_research := self._session.research_results.get(self.persona.id):
+        if my_research:
             instructions += RESEARCH_FINDINGS_PROMPT.format(
                 take=my_research['take'],
                 explanation=my_research['explanation'],
             )
 
+        self._session.instructions_cache[self.persona.id] = (key, instructions)
         return instructions
 
     async def _refresh_instructions(self):
@@ -321,99 +438,177 @@ class DebateAgent(Agent):
         await self.update_instructions(self._build_instructions())
 
     def _reformat_history(self, chat_ctx: ChatContext) -> ChatContext:
-        """Reformat history so current agent sees others as 'user' role. Returns a copy."""
-        formatted = chat_ctx.copy()
-        for i, item in enumerate(formatted.items):
-            if not isinstance(item, DebateChatMessage):
-                continue
-            is_self = item.speaker == self.persona.name
-            content = item.content[0] if item.content else ""
-            formatted.items[i] = DebateChatMessage(
-                **{**item.model_dump(),
-                    "role": "assistant" if is_self else "user",
-                    "content": [content if is_self else f"*{item.speaker} says* {content}"],
-                    "speaker": self.persona.name if is_self else item.speaker,
-                }
-            )
-        return formatted
+        """Reformat history so current agent sees others as 'user' role. Returns a copy.
+
+        Memoized per persona: only items past the longest unchanged prefix since this
+        persona last entered are reformatted.
+        """
+        items = chat_ctx.items
+        if not items:
+            return ChatContext.empty()
+        sources, formatted = self._session.reformatted_history.get(self.persona.id, ((), []))
+        # Identity, not id: conversation_item_added swaps items in place under the same id.
+        done = 0
+        for cached, current in zip(sources, items):
+            if cached is not current:
+                break
+            done += 1
+        if done == len(sources) == len(items):
+            return ChatContext(list(formatted))  # nothing new since this persona last entered
+        self_name = self.persona.name
+        formatted = formatted[:done] + [self._reformat_item(item, self_name) for item in items[done:]]
+        self._session.reformatted_history[self.persona.id] = (tuple(items), formatted)
+        return ChatContext(list(formatted))
+
+    @staticmethod
+    def _reformat_item(item: Any, self_name: str) -> Any:
+        if not isinstance(item, DebateChatMessage):
+            return item
+        speaker = item.speaker
+        if speaker == self_name and item.role == "assistant" and len(item.content) == 1:
+            return item  # own line is already in its final shape; share it
+        content = item.content[0] if item.content else ""
+        if speaker == self_name:
+            role = "assistant"
+        else:
+            role, content = "user", f"*{speaker} says* {content}"
+        # Items are already validated; skip the pydantic round trip.
+        return DebateChatMessage.model_construct(
+            id=item.id,
+            role=role,
+            content=[content],
+            speaker=speaker,
+            interrupted=item.interrupted,
+            created_at=item.created_at,
+        )
+
+    def _rpc_target(self) -> tuple[rtc.Room, str] | None:
+        """Room and frontend identity to RPC, or None when no client is connected."""
+        room = getattr(getattr(self._session, "_room_io", None), "_room", None)
+        if not room or not room.remote_participants:
+            return None
+        return room, next(iter(room.remote_participants.keys()))
 
     async def _send_rpc(self, method: str, payload: Any):
         """Send RPC to frontend client. Silently fails if no client."""
+        await self._send_rpc_raw(method, orjson.dumps(payload).decode())
+
+    async def _send_rpc_raw(self, method: str, payload: str):
+        """Like _send_rpc, for a payload that is already JSON-encoded."""
+        # Checked outside the retry loop: a missing client is not going to appear in 50ms.
+        if (target := self._rpc_target()) is None:
+            return
         try:
-            if self._session._room_io is None:
-                return
-            room = self._session._room_io._room
-            if not room or not room.remote_participants:
-                return
-            client_identity = next(iter(room.remote_participants.keys()))
-            await room.local_participant.perform_rpc(
-                destination_identity=client_identity,
-                method=method,
-                payload=json.dumps(payload),
-            )
+            await self._perform_rpc(*target, method, payload)
         except Exception:
             pass  # RpcError can't be pickled, suppress to avoid log serialization crash
 
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=0.05, max=0.5),
+        retry=retry_if_exception(is_transient_rpc_error),
+        reraise=True,
+    )
+    async def _perform_rpc(self, room: rtc.Room, destination: str, method: str, payload: str):
+        await room.local_participant.perform_rpc(
+            destination_identity=destination,
+            method=method,
+            payload=payload,
+        )
+
+    async def _send_notification(self, method: str, payload: Any):
+        """Best-effort RPC for cosmetic UI state: time-boxed, retried once, never raises."""
+        if (target := self._rpc_target()) is None:
+            return
+        room, destination = target
+        body = orjson.dumps(payload).decode()
+        for attempt in range(2):
+            try:
+                await asyncio.wait_for(
+                    room.local_participant.perform_rpc(destination_identity=destination, method=method, payload=body),
+                    timeout=NOTIFY_RPC_TIMEOUT,
+                )
+                return
+            except Exception:
+                if attempt == 0:
+                    await asyncio.sleep(NOTIFY_RPC_RETRY_DELAY)
+        logging.debug("Dropped %s notification after retry", method)
+
     async def _send_data(self, topic: str, payload: Any):
         """Send data packet to frontend via data channel."""
         try:
             room = getattr(getattr(self._session, "_room_io", None), "_room", None)
             if not room:
-                logging.warning(f"_send_data: no room for topic={topic}")
+                logging.warning("_send_data: no room for topic=%s", topic)
                 return
-            data = json.dumps(payload)
-            await room.local_participant.publish_data(data.encode("utf-8"), topic=topic)
-            logging.info(f"[Data] Sent {topic}: {payload}")
+            await room.local_participant.publish_data(orjson.dumps(payload), topic=topic)
+            logging.info("[Data] Sent %s: %s", topic, payload)
         except Exception as e:
-            logging.exception(f"_send_data failed: {e}")
+            logging.exception("_send_data failed: %s", e)
+
+    async def _notify_speaker_change(self):
+        """Fan out the UI notifications for a new speaker concurrently."""
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(self._send_notification("speaker_changed", {"id": self.persona.id}))
+            tg.create_task(self._send_data("speaker-status", {"speaker": self.persona.name, "id": self.persona.id, "isUser": False}))
+            if self.first:
+                self.first = False  # this agent re-enters on later handoffs; announce the roster once
+                tg.create_task(self._send_rpc_raw("personas_created", self._session.personas_payload))
 
     async def on_enter(self):
-        asyncio.create_task(self._send_rpc("speaker_changed", {"id": self.persona.id}))
-        asyncio.create_task(self._send_data("speaker-status", {"speaker": self.persona.name, "id": self.persona.id, "isUser": False}))
-        if self.first:
-            asyncio.create_task(self._send_rpc("personas_created", [
-                {"id": p.id, "name": p.name, "gender": p.gender, "description": p.description}
-                for p in self.all_personas
-            ]))
+        # UI notifications are cosmetic; keep them off the path to the first reply.
+        self._notify_task = asyncio.create_task(self._notify_speaker_change())
 
         await self.update_chat_ctx(self._reformat_history(self._session.history))
         # for m in self.chat_ctx.items:
         #     if hasattr(m, 'role') and getattr(m, 'role', None) != 'system':
         #         print(f"[{getattr(m, 'speaker', getattr(m, 'role', '?'))}] {getattr(m, 'content', '')}")
-        print(self._session.history.items)
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug("%s entering with %d history items", self.persona.name, len(self._session.history.items))
         try:
-            has_user_message = any(
-                isinstance(item, DebateChatMessage) and item.role == "user"
-                for item in self._session.history.items
-            )
-            if has_user_message:
-                await self._session.generate_reply(
-                    instructions="Respond in ONE clause (<=10 words). Do NOT hand turn to the user."
-                )
-                await self._session.generate_reply(
-                    tool_choice={"type": "function", "function": {"name": "give_turn_to_next_speaker"}},
-                    instructions="Choose who speaks next (not the user). Avoid back-to-back speakers.",
-                )
+            if self._session.has_user_message:
+                await self._reply_and_hand_off()
             else:
                 logging.info("Waiting for initial user input before responding")
         except RuntimeError as e:
             logging.warning("generate_reply skipped (agent not running): %s", e)
+        finally:
+            # Reap the notification task so a failed RPC is logged rather than left unretrieved.
+            try:
+                await self._notify_task
+            except Exception as e:
+                logging.warning("speaker change notification failed: %s", e)
 
     async def on_user_turn_completed(self, turn_ctx, new_message):
         try:
-            await self._session.generate_reply(
-                instructions="Respond in ONE clause (<=10 words). Do NOT hand turn to the user."
-            )
-            await self._session.generate_reply(
-                tool_choice={"type": "function", "function": {"name": "give_turn_to_next_speaker"}},
-                instructions=(
-                    "User just spoke. Choose a new voice (avoid back-to-back speakers). "
-                    "Do NOT hand turn to the user; they speak when they want. Keep answers <=10 words."
-                ),
-            )
+            await self._reply_and_hand_off()
         except RuntimeError as e:
             logging.warning("generate_reply skipped after user turn: %s", e)
 
+    async def _reply_and_hand_off(self):
+        """Speak one turn, then pass the floor without a second LLM round-trip to route it."""
+        # The reply rules live in the static part of the system prompt; per-turn instructions
+        # would be appended after the dynamic tail and re-sent uncached every turn.
+        self._speaker_chosen = False
+        handle = await self._session.generate_reply()
+        # The user barged in, or the model already routed the turn via give_turn_to_next_speaker
+        # (possibly back to the user); the heuristic only fills in when the model made no choice.
+        if handle.interrupted or self._speaker_chosen or self._session.current_agent is not self:
+            return
+        if (p := self._pick_next_speaker()) is not None:
+            self._session.update_agent(await self._agent_for(p))
+
+    async def _agent_for(self, persona: Persona) -> "DebateAgent":
+        """The session's agent for persona, with instructions brought up to date before it re-enters."""
+        agent = self._session.agents_by_id[persona.id]
+        await agent.update_instructions(agent._build_instructions())
+        return agent
+
+    def _pick_next_speaker(self) -> Persona | None:
+        """The other persona who spoke least recently (never-spoken first, then roster order)."""
+        last_turn = {name: i for i, name in enumerate(self._session.turn_history)}
+        return min(self._others, key=lambda p: last_turn.get(p.name, -1), default=None)
+
     @function_tool(name="emoji_reaction", description="Express your character's current emotion with a single emoji")
     async def emoji_reaction(
         self,
@@ -429,45 +624,38 @@ class DebateAgent(Agent):
         context: RunContext,
         speaker: Annotated[str, "Name of next speaker: one of the other participants or 'user'"],
     ):
+        self._speaker_chosen = True
         last = getattr(self._session, "last_speaker", None)
         recent = list(getattr(self._session, "turn_history", [])[-2:])
         turns_since_user = getattr(self._session, "turns_since_user", 0)
 
+        # Lowercase once; personas_by_lname keys are already lowercased, in roster order.
+        by_lname = self._session.personas_by_lname
+        last_l = (last or "").lower()
+        speaker_l = speaker.lower()
+
         # Never proactively hand to the user; reroute to another persona.
-        if speaker.lower() == "user":
-            alt = next(
-                (p for p in self.all_personas if p.name.lower() != (last or "").lower()),
-                self.all_personas[0],
-            )
-            logging.info("User turn requested; rerouting to %s (turns_since_user=%s)", alt.name, turns_since_user)
-            speaker = alt.name
+        if speaker_l == "user":
+            speaker_l = next((n for n in by_lname if n != last_l), self.all_personas[0].name.lower())
+            logging.info("User turn requested; rerouting to %s (turns_since_user=%s)", by_lname[speaker_l].name, turns_since_user)
 
         # Prevent back-to-back from the same voice unless it's the user.
-        if last and speaker.lower() == last.lower() and speaker.lower() != "user":
-            alt = next(
-                (p for p in self.all_personas if p.name.lower() != last.lower() and p.name not in recent),
-                None,
-            )
+        if last and speaker_l == last_l and speaker_l != "user":
+            alt = next((n for n in by_lname if n != last_l and by_lname[n].name not in recent), None)
             if alt:
-                logging.info("Redirecting turn from %s to %s to avoid repeats", speaker, alt.name)
-                speaker = alt.name
+                logging.info("Redirecting turn from %s to %s to avoid repeats", speaker, by_lname[alt].name)
+                speaker_l = alt
             else:
                 # If no alt, ask the user to weigh in.
-                speaker = "user"
+                speaker_l = "user"
 
         # Keep agents volleying; user speaks only when they jump in.
-        if speaker.lower() == "user":
+        if speaker_l == "user":
             asyncio.create_task(self._send_data("speaker-status", {"speaker": "user", "id": None, "isUser": True}))
             return None
 
-        for p in self.all_personas:
-            if p.name.lower() == speaker.lower():
-                return DebateAgent(
-                    topic=self.topic,
-                    persona=p,
-                    all_personas=self.all_personas,
-                    session=self._session,
-                )
+        if p := by_lname.get(speaker_l):
+            return await self._agent_for(p)
 
         # fallback: stay as current
         return None
@@ -485,23 +673,22 @@ class DebateAgent(Agent):
 
         # Only pass through supported expression presets; drop unsupported calls.
         if call_type == "setExpression":
+            ctx = payload.get("context") or {}
             raw_preset = (
                 payload.get("preset")
                 or payload.get("expression")
-                or (payload.get("context") or {}).get("preset")
-                or (payload.get("context") or {}).get("expression")
+                or ctx.get("preset")
+                or ctx.get("expression")
             )
             if not raw_preset:
                 logging.warning("avatar_tool: missing preset for setExpression")
                 return {"status": "skipped", "reason": "missing-preset"}
 
-            preset = raw_preset.lower()
-            preset = self.EXPRESSION_SYNONYMS.get(preset, preset)
-            if preset not in self.SUPPORTED_EXPRESSIONS:
-                logging.warning("avatar_tool: unsupported preset '%s'", preset)
-                return {"status": "skipped", "reason": f"unsupported-preset:{preset}"}
+            preset = self.PRESET_CANON.get(raw_preset.lower())
+            if preset is None:
+                logging.warning("avatar_tool: unsupported preset '%s'", raw_preset.lower())
+                return {"status": "skipped", "reason": f"unsupported-preset:{raw_preset.lower()}"}
 
-            ctx = payload.get("context") or {}
             avatar_id = ctx.get("avatarId")
             if avatar_id and avatar_id not in self.SUPPORTED_AVATAR_IDS:
                 logging.warning("avatar_tool: unsupported avatarId '%s'", avatar_id)
@@ -515,9 +702,8 @@ class DebateAgent(Agent):
             return {"status": "skipped", "reason": f"unsupported-type:{call_type}"}
 
         try:
-            data = json.dumps(payload)
-            await room.local_participant.publish_data(data.encode("utf-8"), topic="avatar-tool")
-            logging.info("avatar_tool sent: %s", data)
+            await room.local_participant.publish_data(orjson.dumps(payload), topic="avatar-tool")
+            logging.info("avatar_tool sent: %s", payload)
             return {"status": "sent"}
         except Exception as e:
             logging.exception("avatar_tool publish failed")
@@ -534,8 +720,8 @@ class DebateAgent(Agent):
     #         raise ToolError(f"Hot take already exists: '{text}'")
     #     if len(takes) >= MAX_HOT_TAKES:
     #         raise ToolError(f"Limit reached ({MAX_HOT_TAKES}). Replace or delete first.")
-    #     takes.append(text)
-    #     logging.info(f"[{self.persona.name}] ADD hot take: {text}")
+    #     takes[text] = None
+    #     logging.info("[%s] ADD hot take: %s", self.persona.name, text)
     #     await self._refresh_instructions()
     #     asyncio.create_task(self._send_rpc("hot_takes_updated", {"takes": list(takes)}))
     #     return "Added"
@@ -550,11 +736,10 @@ class DebateAgent(Agent):
     #     takes = self._session.hot_takes
     #     if old_text not in takes:
     #         raise ToolError(f"Hot take not found: '{old_text}'")
-    #     idx = takes.index(old_text)
-    #     takes[idx] = new_text
-    #     logging.info(f"[{self.persona.name}] REPLACE hot take: '{old_text}' → '{new_text}'")
+    #     self._session.hot_takes = {new_text if t == old_text else t: None for t in takes}
+    #     logging.info("[%s] REPLACE hot take: '%s' → '%s'", self.persona.name, old_text, new_text)
     #     await self._refresh_instructions()
-    #     asyncio.create_task(self._send_rpc("hot_takes_updated", {"takes": list(takes)}))
+    #     asyncio.create_task(self._send_rpc("hot_takes_updated", {"takes": list(self._session.hot_takes)}))
     #     return "Replaced"
 
     # @function_tool(name="delete_hot_take", description="Delete a hot take from the shared list")
@@ -566,8 +751,8 @@ class DebateAgent(Agent):
     #     takes = self._session.hot_takes
     #     if text not in takes:
     #         raise ToolError(f"Hot take not found: '{text}'")
-    #     takes.remove(text)
-    #     logging.info(f"[{self.persona.name}] DELETE hot take: {text}")
+    #     del takes[text]
+    #     logging.info("[%s] DELETE hot take: %s", self.persona.name, text)
     #     await self._refresh_instructions()
     #     asyncio.create_task(self._send_rpc("hot_takes_updated", {"takes": list(takes)}))
     #     return "Deleted"
@@ -579,20 +764,13 @@ class DebateAgent(Agent):
     #     query: Annotated[str, "What to research - be specific about what facts/data you need"],
     #     hand_off_to: Annotated[str, "Name of participant to continue debate while you research"],
     # ):
-    #     logging.info(f"[{self.persona.name}] Starting research: {query}, handing off to {hand_off_to}")
+    #     logging.info("[%s] Starting research: %s, handing off to %s", self.persona.name, query, hand_off_to)
     #     self._session.researching_agents.add(self.persona.id)
     #     asyncio.create_task(self._run_research(query))
     #     # Hand off to another agent
-    #     for p in self.all_personas:
-    #         if p.name.lower() == hand_off_to.lower():
-    #             self._session.say(f"Let me dig deeper on this. {hand_off_to}, take it from here - I'll be back with what I find.")
-    #             return DebateAgent(
-    #                 topic=self.topic,
-    #                 persona=p,
-    #                 all_personas=self.all_personas,
-    #                 session=self._session,
-    #                 hot_takes=self.hot_takes,
-    #             )
+    #     if p := self._session.personas_by_lname.get(hand_off_to.lower()):
+    #         self._session.say(f"Let me dig deeper on this. {hand_off_to}, take it from here - I'll be back with what I find.")
+    #         return await self._agent_for(p)
     #     # Fallback: hand to user
     #     self._session.say("Let me research this. What do you think in the meantime?")
     #     return None
@@ -610,7 +788,7 @@ class DebateAgent(Agent):
             if event.type == EventType.DONE:
                 self._session.research_results[self.persona.id] = event.data
                 self._session.researching_agents.discard(self.persona.id)
-                logging.info(f"[{self.persona.name}] Research complete: {event.data['take'][:100]}")
+                logging.info("[%s] Research complete: %.100s", self.persona.name, event.data['take'])
                 await self._refresh_instructions()
                 
                 # Notify that agent is back with findings
@@ -626,9 +804,9 @@ class TopicCollectorAgent(Agent):
 
     def __init__(self):
         if USE_VOICE_CLONE:
-            tts_instance = VoiceCloneTTS(voice="romaco")
+            tts_instance = VoiceCloneTTS(voice="romaco", api_key=XAI_API_KEY)
         else:
-            tts_instance = XaiTTS(voice=VOICES["female"][0].lower())
+            tts_instance = XaiTTS(voice=VOICES_LOWER["female"][0], api_key=XAI_API_KEY)
 
         super().__init__(
             instructions="Wait silently for the user's first message; do not respond.",
@@ -639,49 +817,85 @@ class TopicCollectorAgent(Agent):
         logging.info("TopicCollector: waiting for first user utterance")
 
 
-server = agents.AgentServer()
+def prewarm(proc: agents.JobProcess):
+    """Load the VAD once per worker process instead of once per session."""
+    # The turn detector is not loaded here: it binds to the job's inference executor, and its
+    # model already lives in the shared inference process.
+    proc.userdata["vad"] = silero.VAD.load()
+
+
+server = agents.AgentServer(setup_fnc=prewarm)
 
 
 @server.rtc_session()
 async def entrypoint(ctx: agents.JobContext):
-    metadata: dict[str, Any] = json.loads(ctx.job.metadata or '{}')
-    topic = metadata.get("topic")
-    genders: list[str] = metadata.get("genders", ["female", "female"])
+    settings = SessionSettings.from_metadata(ctx.job.metadata)
+    topic, genders = settings.topic, settings.genders
 
-    logging.info(f"Starting session with {topic=} and {genders=}")
+    logging.info("Starting session with topic=%r and genders=%r", topic, genders)
     session = AgentSession(
-        llm=openai.LLM.with_x_ai(model="grok-4-1-fast-non-reasoning"),
+        llm=openai.LLM.with_x_ai(model="grok-4-1-fast-non-reasoning", api_key=XAI_API_KEY),
         stt=openai.STT(
             base_url="https://api.x.ai/v1",
-            api_key=os.environ.get("XAI_API_KEY"),
+            api_key=XAI_API_KEY,
             model="whisper-1",
         ),
-        vad=silero.VAD.load(),
+        vad=ctx.proc.userdata.get("vad") or silero.VAD.load(),  # loaded per session only if prewarm didn't run
         turn_detection=EnglishTurnDetector(),
     )
+    # TTS is warmed separately: each agent start calls tts.prewarm(), which fills its connection pool.
+    session.warmup_task = asyncio.create_task(warm_up_connections(session.llm, session.stt))
+    ctx.add_shutdown_callback(close_research_client)  # the shared research client outlives each call
     session.research_results = {}  # {persona_id: {take, explanation, image_url}}
     session.researching_agents = set()  # persona_ids currently researching
     session.voices = {}
-    session.hot_takes = []
+    session.tts_by_id = {}  # persona_id → TTS client reused across handoffs
+    session.personas_by_lname = {}  # lowercased name → Persona
+    session.personas_payload = "[]"  # personas_created RPC body, encoded once per roster
+    session.instruction_parts = {}  # persona_id → AGENT_INSTRUCTIONS with persona fields folded in
+    session.other_personas = {}  # persona_id → "A, B, and User" roster line when nobody is researching
+    session.instructions_cache = {}  # persona_id → (inputs key, rendered instructions)
+    session.agents_by_id = {}  # persona_id → DebateAgent, reused across handoffs
+    session.reformatted_history = {}  # persona_id → (source history items, reformatted items)
+    session.hot_takes = {}  # insertion-ordered set of take texts (values unused)
     session.last_speaker = None
     session.turn_history = []
     session.turns_since_user = 0
+    session.has_user_message = False  # flips once; spares on_enter a history scan
     session.min_turns_before_user = MIN_TURNS_BEFORE_USER
     session.current_topic = clean_topic_text(topic) if topic else None
 
     @session.on("conversation_item_added")
     def conversation_item_added(ev: agents.ConversationItemAddedEvent):
+        if not isinstance(ev.item, ChatMessage):
+            return
         agent = session.current_agent
         if isinstance(agent, DebateAgent):
             speaker = agent.persona.name if ev.item.role == "assistant" else "user"
         else:
             speaker = "user" if ev.item.role == "user" else "assistant"
-        session.history.items[-1] = DebateChatMessage(**ev.item.model_dump(), speaker=speaker)
+        # ev.item was validated by livekit; copy its fields as-is (model_dump would flatten nested content).
+        if isinstance(ev.item, DebateChatMessage):
+            ev.item.speaker = speaker
+        else:
+            tagged = DebateChatMessage.model_construct(**ev.item.__dict__, speaker=speaker)
+            items = session.history.items
+            # Items are inserted by created_at, so the new one is almost always the tail;
+            # otherwise find it from the end rather than overwriting whatever is last.
+            if items and items[-1] is ev.item:
+                items[-1] = tagged
+            else:
+                for i in range(len(items) - 1, -1, -1):
+                    if items[i] is ev.item:
+                        items[i] = tagged
+                        break
         session.last_speaker = speaker
         session.turn_history.append(speaker)
         if len(session.turn_history) > 50:
             session.turn_history = session.turn_history[-50:]
         session.turns_since_user = 0 if speaker == "user" else session.turns_since_user + 1
+        if ev.item.role == "user":
+            session.has_user_message = True
         if speaker == "user" and ev.item.content:
             # Track latest user subject to force personas to pivot
             cleaned = clean_topic_text(ev.item.content[0])
@@ -693,34 +907,54 @@ async def entrypoint(ctx: agents.JobContext):
                 asyncio.create_task(agent.update_instructions(agent._build_instructions()))
 
     async def _start_with_topic(resolved_topic: str, user_text: str | None = None):
-        personas = generate_debating_personas(resolved_topic, tuple(genders))
+        personas = generate_debating_personas(resolved_topic, genders)
         voices = {p.id: select_voice(p) for p in personas}
         session.voices = voices
+        session.tts_by_id = {p.id: create_tts(p, voices[p.id]) for p in personas}
+        session.personas_by_lname = {p.name.lower(): p for p in personas}
+        session.personas_payload = orjson.dumps([
+            {"id": p.id, "name": p.name, "gender": p.gender, "description": p.description}
+            for p in personas
+        ]).decode()
+        session.instruction_parts = {
+            p.id: compile_template(AGENT_INSTRUCTIONS, persona_name=p.name, persona_prompt=p.prompt)
+            for p in personas
+        }
+        session.other_personas = {
+            p.id: ", ".join(o.name for o in personas if o.name != p.name) + ", and User" for p in personas
+        }
+        session.instructions_cache = {}
         session.current_topic = resolved_topic
-        session.hot_takes = session.hot_takes or []
-        for p in personas:
-            logging.info(f"  [{p.id}] {p.name} ({p.gender}): {p.description}")
+        session.hot_takes = session.hot_takes or {}
+        if logging.getLogger().isEnabledFor(logging.INFO):
+            for p in personas:
+                logging.info("  [%s] %s (%s): %s", p.id, p.name, p.gender, p.description)
         if user_text:
             session.history.items.append(
                 DebateChatMessage(role="user", content=[user_text], speaker="user")
             )
-        session.update_agent(
-            DebateAgent(
-                topic=resolved_topic,
-                persona=next(iter(personas)),
-                all_personas=personas,
-                session=session,
-                first=True,
-            )
-        )
+            session.has_user_message = True
+        # One agent per persona for the whole session; handoffs re-enter these instead of building new ones.
+        session.agents_by_id = {
+            p.id: DebateAgent(topic=resolved_topic, persona=p, all_personas=personas, session=session, first=i == 0)
+            for i, p in enumerate(personas)
+        }
+        session.update_agent(session.agents_by_id[personas[0].id])
         if getattr(session, "_update_activity_atask", None):
             try:
                 await asyncio.shield(session._update_activity_atask)
             except Exception:
                 logging.exception("Error while waiting for agent handoff")
 
+    async def _close_tts() -> None:
+        # Persona TTS clients outlive every agent, so nothing else releases their pooled sockets.
+        for tts_instance in session.tts_by_id.values():
+            await tts_instance.aclose()
+
+    ctx.add_shutdown_callback(_close_tts)
+
     if topic:
-        logging.info(f"Starting session with topic from metadata: {topic} and {genders=}")
+        logging.info("Starting session with topic from metadata: %s and genders=%r", topic, genders)
         await _start_with_topic(topic)
     else:
         logging.info("No topic in metadata; starting TopicCollectorAgent to derive from user speech")
@@ -746,11 +980,13 @@ async def entrypoint(ctx: agents.JobContext):
 
             asyncio.create_task(_start_with_topic(topic_text, topic_text))
 
+        collector = TopicCollectorAgent()
+        ctx.add_shutdown_callback(collector.tts.aclose)
         await session.start(
             room=ctx.room,
-            agent=TopicCollectorAgent(),
+            agent=collector,
             room_options=room_io.RoomOptions(
-                audio_input=room_io.AudioInputOptions(noise_cancellation=noise_cancellation.BVC()),
+                audio_input=room_io.AudioInputOptions(noise_cancellation=NOISE_CANCELLATION),
                 audio_output=room_io.AudioOutputOptions(sample_rate=44100),
             ),
         )
@@ -5,7 +5,7 @@ Flow: problem → thinking → done (1 take + 1 image)
 """
 import asyncio
 import json
-import re
+import random
 from dataclasses import dataclass
 from enum import Enum
 from typing import AsyncGenerator, Optional
@@ -19,6 +19,10 @@ from xai_sdk.tools import web_search
 load_dotenv()
 
 
+HEDGE_DELAY = 1.5  # seconds before a backup search is launched
+HEDGE_JITTER = 0.25  # spread hedges so concurrent researchers don't fire in lockstep
+
+
 class EventType(Enum):
     SEARCHING = "searching"
     PROCESSING_DATA = "processing_data"
@@ -44,28 +48,48 @@ Output JSON:
 }"""
 
 
+_DECODER = json.JSONDecoder()
+
+
 def extract_json(text: str) -> Optional[dict]:
-    """Extract JSON from text."""
-    match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', text, re.DOTALL)
-    if match:
-        try:
-            return json.loads(match.group(1))
-        except json.JSONDecodeError:
-            pass
-    match = re.search(r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}', text, re.DOTALL)
-    if match:
-        try:
-            return json.loads(match.group(0))
-        except json.JSONDecodeError:
-            pass
+    """Extract JSON from text, preferring an object inside a ``` fence."""
+    # raw_decode from each candidate '{' is linear per attempt; no regex backtracking.
+    fence = text.find("```")
+    for start in (fence, 0) if fence > 0 else (0,):
+        i = text.find("{", start)
+        while i != -1:
+            try:
+                return _DECODER.raw_decode(text, i)[0]
+            except json.JSONDecodeError:
+                i = text.find("{", i + 1)
     return None
 
 
+# One client (and so one gRPC channel) per event loop, reused across research calls.
+# The channel holds its loop, so entries stay until close_client() drops them.
+_clients: dict[asyncio.AbstractEventLoop, AsyncClient] = {}
+
+
+def _get_client() -> AsyncClient:
+    """Shared xAI client for the running loop; its channel can't be used from another loop."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = AsyncClient()
+    return client
+
+
+async def close_client() -> None:
+    """Close the running loop's shared client; the next research call opens a fresh one."""
+    if (client := _clients.pop(asyncio.get_running_loop(), None)) is not None:
+        await client.close()
+
+
 async def research_agent(problem: str) -> AsyncGenerator[AgentEvent, None]:
     """
     Research agent: problem → thinking → done (1 take + 1 image)
     """
-    client = AsyncClient()
+    client = _get_client()
     
     try:
         # ═══════════════════════════════════════════════════════════════
@@ -83,13 +107,16 @@ async def research_agent(problem: str) -> AsyncGenerator[AgentEvent, None]:
             )
             return await chat.sample()
         
-        # Run 3 in parallel, take fastest
-        tasks = [asyncio.create_task(do_search()) for _ in range(3)]
-        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
-        
-        # Cancel the rest
-        for task in pending:
-            task.cancel()
+        # One search; hedge with a second only if the first runs past the usual latency
+        primary = asyncio.create_task(do_search())
+        done, _ = await asyncio.wait({primary}, timeout=HEDGE_DELAY + random.uniform(0, HEDGE_JITTER))
+        if not done:
+            backup = asyncio.create_task(do_search())
+            done, pending = await asyncio.wait({primary, backup}, return_when=asyncio.FIRST_COMPLETED)
+            
+            # Cancel the loser
+            for task in pending:
+                task.cancel()
         
         response = done.pop().result()
         
@@ -117,8 +144,6 @@ async def research_agent(problem: str) -> AsyncGenerator[AgentEvent, None]:
     except Exception as e:
         yield AgentEvent(EventType.ERROR, {"error": str(e)})
         raise
-    finally:
-        await client.close()
 
 
 async def main():
@@ -128,24 +153,32 @@ async def main():
     
     print(f"\nProblem: {problem}\n")
     
-    async for event in research_agent(problem):
-        match event.type:
-            case EventType.SEARCHING:
-                print("✓ SEARCHING")
+    try:
+        async for event in research_agent(problem):
+            match event.type:
+                case EventType.SEARCHING:
+                    print("✓ SEARCHING")
             
-            case EventType.PROCESSING_DATA:
-                print("✓ PROCESSING_DATA")
+                case EventType.PROCESSING_DATA:
+                    print("✓ PROCESSING_DATA")
             
-            case EventType.DONE:
-                print("✓ DONE\n")
-                print(f"🔥 {event.data.get('take')}\n")
-                print(f"{event.data.get('explanation')}\n")
-                if event.data.get("image_url"):
-                    print(f"🖼  {event.data['image_url']}")
+                case EventType.DONE:
+                    print("✓ DONE\n")
+                    print(f"🔥 {event.data.get('take')}\n")
+                    print(f"{event.data.get('explanation')}\n")
+                    if event.data.get("image_url"):
+                        print(f"🖼  {event.data['image_url']}")
             
-            case EventType.ERROR:
-                print(f"❌ {event.data.get('error')}")
+                case EventType.ERROR:
+                    print(f"❌ {event.data.get('error')}")
+    finally:
+        await close_client()
 
 
 if __name__ == "__main__":
+    try:  # optional: libuv-backed event loop, as app.py uses
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:  # not installed / Windows
+        pass
     asyncio.run(main())
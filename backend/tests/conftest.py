@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Backend modules are run as scripts (`uv run backend/app.py`) and import each other top-level.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
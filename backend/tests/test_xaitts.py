@@ -0,0 +1,51 @@
+import asyncio
+from base64 import b64encode
+
+import orjson
+import websockets
+
+import xaitts
+
+PCM_FRAME = b"\x01\x00" * 2400  # 100 ms of audio per text chunk
+
+
+async def _speak(texts: list[str], *, flush: bool = False) -> tuple[int, int]:
+    """Stream texts through xaitts.TTS against a local fake xAI server; (audio events, sockets opened)."""
+    connections = 0
+
+    async def handler(ws):
+        nonlocal connections
+        connections += 1
+        await ws.recv()  # config
+        async for raw in ws:
+            msg = orjson.loads(raw)
+            await ws.send(orjson.dumps({"data": {"data": {
+                "audio": b64encode(PCM_FRAME).decode(), "is_last": msg["data"]["is_last"],
+            }}}).decode())
+
+    async with websockets.serve(handler, "127.0.0.1", 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        tts = xaitts.TTS(api_key="test", base_url=f"http://127.0.0.1:{port}")
+        stream = tts.stream()
+        for text in texts:
+            stream.push_text(text)
+        if flush:
+            stream.flush()
+        stream.end_input()
+        events = [ev async for ev in stream]
+        await tts.aclose()
+    return len(events), connections
+
+
+def test_stream_without_text_opens_no_socket():
+    assert asyncio.run(_speak([])) == (0, 0)
+
+
+def test_tool_only_reply_opens_no_socket():
+    assert asyncio.run(_speak(["", "  ", "\n"], flush=True)) == (0, 0)
+
+
+def test_stream_with_text_is_spoken_over_one_socket():
+    events, connections = asyncio.run(_speak(["Look,", " that's", " wrong."]))
+    assert events > 0
+    assert connections == 1
@@ -0,0 +1,131 @@
+import asyncio
+import io
+
+import aiohttp
+import av
+import numpy as np
+from aiohttp import web
+
+import xaitts_cloning
+
+
+async def _serve(handler) -> tuple[web.AppRunner, str]:
+    app = web.Application()
+    app.router.add_route("*", "/generate", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    return runner, f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/generate"
+
+
+def test_prewarm_warms_once_per_loop(monkeypatch):
+    requests = []
+
+    async def handler(request):
+        requests.append(request.method)
+        return web.Response(status=405, text="method not allowed")
+
+    async def main():
+        runner, url = await _serve(handler)
+        monkeypatch.setattr(xaitts_cloning, "CLONE_API_URL", url)
+        voices = [xaitts_cloning.VoiceCloneTTS(voice=v, api_key="test") for v in ("romaco", "yuri")]
+        for _ in range(3):  # one prewarm per speaker handoff
+            for tts in voices:
+                tts.prewarm()
+        await xaitts_cloning._warmups[asyncio.get_running_loop()]
+        await voices[0].aclose()
+        assert asyncio.get_running_loop() in xaitts_cloning._sessions  # still used by the other voice
+        await voices[1].aclose()
+        assert asyncio.get_running_loop() not in xaitts_cloning._sessions
+        assert asyncio.get_running_loop() not in xaitts_cloning._warmups
+        await runner.cleanup()
+
+    asyncio.run(main())
+    assert requests == ["GET"]
+
+
+def test_prewarm_timeout_is_swallowed(monkeypatch):
+    async def handler(request):
+        await asyncio.sleep(1)
+        return web.Response()
+
+    async def main():
+        runner, url = await _serve(handler)
+        monkeypatch.setattr(xaitts_cloning, "CLONE_API_URL", url)
+        monkeypatch.setattr(xaitts_cloning, "REQUEST_TIMEOUT", aiohttp.ClientTimeout(total=0.1))
+        tts = xaitts_cloning.VoiceCloneTTS(api_key="test")
+        tts.prewarm()
+        task = xaitts_cloning._warmups[asyncio.get_running_loop()]
+        await asyncio.wait([task])
+        await tts.aclose()
+        await runner.cleanup()
+        return task.exception()
+
+    assert asyncio.run(main()) is None
+
+
+
+def _mp3(seconds: float = 0.5) -> bytes:
+    """A short mp3 tone, encoded the way the API's files are laid out (leading ID3 tag)."""
+    buf = io.BytesIO()
+    with av.open(buf, "w", format="mp3") as container:
+        stream = container.add_stream("mp3", rate=44100)
+        stream.layout = "mono"
+        t = np.arange(int(44100 * seconds)) / 44100
+        frame = av.AudioFrame.from_ndarray(
+            (np.sin(2 * np.pi * 440 * t) * 10000).astype(np.int16)[None, :], format="s16", layout="mono"
+        )
+        frame.sample_rate = 44100
+        for packet in [*stream.encode(frame), *stream.encode(None)]:
+            container.mux(packet)
+    return buf.getvalue()
+
+
+def _decode(mp3: bytes, chunk_size: int) -> bytes:
+    decoder = xaitts_cloning._Mp3Decoder()
+    pcm = b"".join(decoder.decode(mp3[i:i + chunk_size]) for i in range(0, len(mp3), chunk_size))
+    return pcm + decoder.flush()
+
+
+def test_decoder_output_does_not_depend_on_chunking():
+    mp3 = _mp3()
+    assert mp3.startswith(b"ID3")
+    whole = _decode(mp3, len(mp3))
+    assert len(whole) > xaitts_cloning.SAMPLE_RATE  # ~0.5 s of int16 audio
+    for chunk_size in (1, 7, 100, 4096):
+        assert _decode(mp3, chunk_size) == whole
+
+
+def test_decoder_flush_parses_short_pending_tail_once(monkeypatch):
+    parsed = []
+    decoder = xaitts_cloning._Mp3Decoder()
+    monkeypatch.setattr(decoder, "_parse", lambda data: parsed.append(data) or b"")
+
+    assert decoder.decode(b"abc") == b""  # fewer than 10 bytes: still buffering for an ID3 header
+    decoder.flush()
+    assert parsed == [b"abc"]
+
+
+def test_sentence_shorter_than_fade_is_still_spoken(monkeypatch):
+    monkeypatch.setattr(xaitts_cloning, "_pcm_cache", xaitts_cloning._PCMCache(4, 1 << 20))
+
+    async def main():
+        tts = xaitts_cloning.VoiceCloneTTS(api_key="test")
+        opts = tts._opts
+        pcm = b"\x01\x00" * (xaitts_cloning.FADE_SAMPLES // 2)  # decodes to under the 2 ms hold-back
+        key = xaitts_cloning._pcm_cache.key(opts.voice if opts.voice_b64 else "None", "Hi.")
+        xaitts_cloning._pcm_cache.put(key, pcm)
+        async with tts.synthesize("Hi.") as stream:
+            audio = b"".join([bytes(ev.frame.data) async for ev in stream])
+        await tts.aclose()
+        return pcm, audio
+
+    pcm, audio = asyncio.run(main())
+    assert audio == pcm
+
+
+def test_coalesce_folds_short_last_fragment_back():
+    long_sentence = "This sentence is comfortably longer than the minimum chunk size."
+    assert xaitts_cloning._coalesce([long_sentence, "Right?"]) == [f"{long_sentence} Right?"]
+    assert xaitts_cloning._coalesce(["x" * 298, "Right?"], max_chars=300) == ["x" * 298, "Right?"]
@@ -9,21 +9,33 @@ Audio format: PCM linear16, 24kHz, mono
 from __future__ import annotations
 
 import asyncio
-import base64
-import json
 import os
+import re
+from base64 import b64decode
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 from dataclasses import dataclass
 from typing import Literal
 
+import orjson
 import websockets
-from livekit.agents import tts, APIConnectOptions, APIConnectionError
+from websockets.asyncio.client import ClientConnection
+from websockets.protocol import State
+from livekit.agents import tts, utils, APIConnectOptions, APIConnectionError, APITimeoutError
 from livekit.agents.types import DEFAULT_API_CONNECT_OPTIONS
 
 SAMPLE_RATE = 24000
 NUM_CHANNELS = 1
+WS_MAX_SESSION_DURATION = 300  # seconds an idle pooled socket is trusted before reconnecting
+FIRST_FRAME_TIMEOUT = 2.0  # seconds from the final text to the next audio frame
+NEXT_FRAME_TIMEOUT = 1.0  # seconds between frames once audio is flowing for text already sent
+STREAM_IDLE_TIMEOUT = 30.0  # seconds between frames while streamed text is still arriving
 
 XAI_VOICES = Literal["ara", "rex", "sal", "eve", "una", "leo"]
 
+# Streamed text is sent to xAI one clause at a time, as soon as the clause is complete.
+_CLAUSE_BOUNDARY = re.compile(r"[,.?!]\s")
+
 
 @dataclass
 class _TTSOptions:
@@ -41,7 +53,7 @@ class TTS(tts.TTS):
         base_url: str = "https://api.x.ai/v1",
     ) -> None:
         super().__init__(
-            capabilities=tts.TTSCapabilities(streaming=False),
+            capabilities=tts.TTSCapabilities(streaming=True),
             sample_rate=SAMPLE_RATE,
             num_channels=NUM_CHANNELS,
         )
@@ -55,6 +67,14 @@ class TTS(tts.TTS):
             api_key=api_key,
             base_url=base_url,
         )
+        # Sockets are configured for this TTS's voice on connect and reused across utterances,
+        # keeping the TLS handshake and upgrade off every turn.
+        self._pool = utils.ConnectionPool[ClientConnection](
+            connect_cb=self._connect_ws,
+            close_cb=self._close_ws,
+            max_session_duration=WS_MAX_SESSION_DURATION,
+            mark_refreshed_on_get=True,
+        )
 
     @property
     def model(self) -> str:
@@ -67,14 +87,110 @@ class TTS(tts.TTS):
     def update_options(self, *, voice: XAI_VOICES | None = None) -> None:
         if voice:
             self._opts.voice = voice
+            self._pool.invalidate()  # pooled sockets were configured for the old voice
 
     def synthesize(
         self, text: str, *, conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS
     ) -> "ChunkedStream":
         return ChunkedStream(tts=self, input_text=text, conn_options=conn_options)
 
+    def stream(
+        self, *, conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS
+    ) -> "SynthesizeStream":
+        return SynthesizeStream(tts=self, conn_options=conn_options)
+
+    def prewarm(self) -> None:
+        self._pool.prewarm()
+
+    async def _connect_ws(self, timeout: float) -> ClientConnection:
+        opts = self._opts
+        ws_url = opts.base_url.replace("https://", "wss://").replace("http://", "ws://")
+        ws = await websockets.connect(
+            f"{ws_url}/realtime/audio/speech",
+            additional_headers={"Authorization": f"Bearer {opts.api_key}"},
+            open_timeout=timeout,
+            close_timeout=5,
+        )
+        # Send config
+        await ws.send(orjson.dumps({
+            "type": "config",
+            "data": {"voice_id": opts.voice}
+        }).decode())
+        return ws
+
+    async def _close_ws(self, ws: ClientConnection) -> None:
+        await ws.close()
+
+    @asynccontextmanager
+    async def _connection(self, timeout: float) -> AsyncIterator[ClientConnection]:
+        """A configured socket from the pool, put back afterwards only if it is still open."""
+        ws = await self._pool.get(timeout=timeout)
+        while ws.state is not State.OPEN:  # closed by the server while it sat idle
+            self._pool.remove(ws)
+            ws = await self._pool.get(timeout=timeout)
+        try:
+            yield ws
+        except BaseException:
+            self._pool.remove(ws)
+            raise
+        if ws.state is State.OPEN:
+            self._pool.put(ws)
+        else:
+            self._pool.remove(ws)
+
     async def aclose(self) -> None:
-        pass
+        await self._pool.aclose()
+
+
+def _split_complete(text: str) -> tuple[str, str]:
+    """Split text after its last clause boundary: (ready to send, still pending)."""
+    end = 0
+    for match in _CLAUSE_BOUNDARY.finditer(text):
+        end = match.end()
+    return text[:end], text[end:]
+
+
+async def _send_text(ws, text: str, is_last: bool) -> None:
+    await ws.send(orjson.dumps({
+        "type": "text_chunk",
+        "data": {"text": text, "is_last": is_last}
+    }).decode())
+
+
+async def _recv_audio(
+    ws, output_emitter: tts.AudioEmitter, input_done: asyncio.Event | None = None
+) -> None:
+    """Push each audio frame to the emitter as it arrives, until xAI marks the last one.
+
+    ``input_done`` is given for streamed input; until it is set xAI may legitimately go
+    quiet while it waits for more text.
+    """
+    received = False
+    while True:
+        if input_done is not None and not input_done.is_set():
+            timeout = STREAM_IDLE_TIMEOUT
+        elif not received or input_done is not None:
+            timeout = FIRST_FRAME_TIMEOUT
+        else:
+            timeout = NEXT_FRAME_TIMEOUT
+        try:
+            response = await asyncio.wait_for(ws.recv(), timeout=timeout)
+        except asyncio.TimeoutError:
+            # A retry would replay audio that already went out, or, for streamed input,
+            # resend nothing since the input channel is already drained; end the utterance instead.
+            raise APITimeoutError(
+                "Timeout waiting for audio", retryable=not received and input_done is None
+            ) from None
+        received = True
+        frame = orjson.loads(response)["data"]["data"]
+        is_last = frame.get("is_last", False)
+
+        chunk_bytes = b64decode(frame["audio"])
+        if chunk_bytes:
+            output_emitter.push(chunk_bytes)
+
+        if is_last:
+            break
 
 
 class ChunkedStream(tts.ChunkedStream):
@@ -85,30 +201,12 @@ class ChunkedStream(tts.ChunkedStream):
         self._tts: TTS = tts
 
     async def _run(self, output_emitter: tts.AudioEmitter) -> None:
-        opts = self._tts._opts
-        ws_url = opts.base_url.replace("https://", "wss://").replace("http://", "ws://")
-        uri = f"{ws_url}/realtime/audio/speech"
-        headers = {"Authorization": f"Bearer {opts.api_key}"}
-
         request_id = f"xai-tts-{id(self)}"
 
         try:
-            async with websockets.connect(
-                uri,
-                additional_headers=headers,
-                close_timeout=5,
-            ) as ws:
-                # Send config
-                await ws.send(json.dumps({
-                    "type": "config",
-                    "data": {"voice_id": opts.voice}
-                }))
-
+            async with self._tts._connection(self._conn_options.timeout) as ws:
                 # Send text (all at once for non-streaming)
-                await ws.send(json.dumps({
-                    "type": "text_chunk",
-                    "data": {"text": self.input_text, "is_last": True}
-                }))
+                await _send_text(ws, self.input_text, is_last=True)
 
                 output_emitter.initialize(
                     request_id=request_id,
@@ -118,26 +216,78 @@ class ChunkedStream(tts.ChunkedStream):
                 )
 
                 # Receive audio chunks
-                while True:
-                    try:
-                        response = await asyncio.wait_for(ws.recv(), timeout=30)
-                        data = json.loads(response)
+                await _recv_audio(ws, output_emitter)
+
+        except APIConnectionError:
+            raise
+        except websockets.exceptions.WebSocketException as e:
+            raise APIConnectionError(f"WebSocket error: {e}") from e
+        except Exception as e:
+            raise APIConnectionError(f"TTS error: {e}") from e
+
+
+class SynthesizeStream(tts.SynthesizeStream):
+    """Streams LLM text to xAI clause by clause while audio for earlier clauses plays."""
+
+    def __init__(self, *, tts: TTS, conn_options: APIConnectOptions) -> None:
+        super().__init__(tts=tts, conn_options=conn_options)
+        self._tts: TTS = tts
+
+    async def _run(self, output_emitter: tts.AudioEmitter) -> None:
+        request_id = utils.shortuuid()
+
+        output_emitter.initialize(
+            request_id=request_id,
+            sample_rate=SAMPLE_RATE,
+            num_channels=NUM_CHANNELS,
+            mime_type="audio/pcm",
+            stream=True,
+        )
 
-                        audio_b64 = data["data"]["data"]["audio"]
-                        is_last = data["data"]["data"].get("is_last", False)
+        # Hold the input until there is something to say; tool-only replies open a stream too
+        # and must not take a pooled socket and wait out FIRST_FRAME_TIMEOUT on empty text.
+        pending = ""
+        async for data in self._input_ch:
+            if isinstance(data, self._FlushSentinel):
+                continue
+            pending += data
+            if pending.strip():
+                break
+        else:
+            return
 
-                        chunk_bytes = base64.b64decode(audio_b64)
-                        if chunk_bytes:
-                            output_emitter.push(chunk_bytes)
+        input_done = asyncio.Event()
 
-                        if is_last:
-                            break
+        async def _send_task(ws, pending: str) -> None:
+            ready, pending = _split_complete(pending)
+            if ready.strip():
+                await _send_text(ws, ready, is_last=False)
+            async for data in self._input_ch:
+                # One segment per stream: the trailing text goes out with is_last once input ends.
+                if isinstance(data, self._FlushSentinel):
+                    continue
+                ready, pending = _split_complete(pending + data)
+                if ready.strip():
+                    await _send_text(ws, ready, is_last=False)
+            await _send_text(ws, pending, is_last=True)
+            input_done.set()
 
-                    except asyncio.TimeoutError:
-                        raise APIConnectionError("Timeout waiting for audio") from None
+        async def _recv_task(ws) -> None:
+            output_emitter.start_segment(segment_id=request_id)
+            await _recv_audio(ws, output_emitter, input_done)
+            output_emitter.end_segment()
 
+        try:
+            async with self._tts._connection(self._conn_options.timeout) as ws:
+                tasks = [asyncio.create_task(_send_task(ws, pending)), asyncio.create_task(_recv_task(ws))]
+                try:
+                    await asyncio.gather(*tasks)
+                finally:
+                    await utils.aio.gracefully_cancel(*tasks)
+
+        except APIConnectionError:
+            raise
         except websockets.exceptions.WebSocketException as e:
             raise APIConnectionError(f"WebSocket error: {e}") from e
         except Exception as e:
             raise APIConnectionError(f"TTS error: {e}") from e
-
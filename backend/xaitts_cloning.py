@@ -7,18 +7,25 @@ API: https://us-east-4.api.x.ai/voice-staging/api/v1/text-to-speech/generate
 
 from __future__ import annotations
 
+import asyncio
 import base64
+import hashlib
 import logging
+import mmap
 import os
 import re
-import subprocess
 import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from functools import lru_cache
 from pathlib import Path
 
-import requests
-from livekit.agents import tts, APIConnectOptions, APIConnectionError
+import aiohttp
+import av
+import numpy as np
+import orjson
+from livekit.agents import tts, utils, APIConnectOptions, APIConnectionError
 from livekit.agents.types import DEFAULT_API_CONNECT_OPTIONS
 
 logger = logging.getLogger("root")
@@ -34,45 +41,241 @@ VOICE_CLONE_FILES = {
 }
 
 CLONE_API_URL = "https://us-east-4.api.x.ai/voice-staging/api/v1/text-to-speech/generate"
+MAX_CONCURRENT_SENTENCES = 3  # sentence requests in flight per utterance
+MIN_CHUNK_CHARS = 40  # shorter sentences are merged with the next one (the last with the previous)
+MAX_CHUNK_CHARS = 300  # longer sentences are split at commas/semicolons
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=30)
+FADE_SAMPLES = SAMPLE_RATE * 2 // 1000  # 2 ms ramp where independently synthesized sentences join
+FADE_BYTES = FADE_SAMPLES * 2
+PCM_CACHE_MAX_ENTRIES = 256  # synthesized sentences kept across utterances
+PCM_CACHE_MAX_BYTES = 64 * 1024 * 1024
+ID3_HEADER_SIZE = 10
 
 
 @lru_cache(maxsize=8)
-def _file_to_base64(file_path: str) -> str:
-    """Cache voice file base64 to avoid repeated disk reads."""
-    with open(file_path, "rb") as f:
-        return base64.b64encode(f.read()).decode("utf-8")
+def _load_voice_b64(voice: str) -> bytes | None:
+    """Base64 of the voice's clone sample, read once per voice; None if it has no sample."""
+    voice_file = VOICE_CLONE_FILES.get(voice)
+    if not voice_file:
+        return None
+    # Resolve relative to project root (one level up from backend/)
+    path = Path(__file__).parent.parent / voice_file
+    if not path.exists():
+        return None
+    start = time.perf_counter()
+    # Encode straight from the mapped file and keep ASCII bytes: no read copy, no str decode
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        voice_b64 = base64.b64encode(mapped)
+    logger.info("[TTS] Base64 encoding: %.3fs (file: %s)", time.perf_counter() - start, path)
+    return voice_b64
+
+
+# mp3 decoding runs here so the event loop keeps serving audio and requests meanwhile
+_DECODE_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="clone-decode")
+_FADE_IN = np.linspace(0.0, 1.0, FADE_SAMPLES, dtype=np.float32)
+
+
+def _fade(pcm: bytes, *, fade_in: bool) -> bytes:
+    """Ramp the head (fade_in) or tail of int16 PCM so sentence joins don't click."""
+    samples = np.frombuffer(pcm, dtype=np.int16).copy()
+    n = min(FADE_SAMPLES, len(samples))
+    if fade_in:
+        samples[:n] = samples[:n] * _FADE_IN[:n]
+    else:
+        samples[len(samples) - n:] = samples[len(samples) - n:] * _FADE_IN[::-1][FADE_SAMPLES - n:]
+    return samples.tobytes()
+
+
+class _PCMCache:
+    """LRU of decoded sentence audio keyed on (voice, text), bounded by count and size."""
+
+    def __init__(self, max_entries: int, max_bytes: int) -> None:
+        self._entries: OrderedDict[bytes, bytes] = OrderedDict()
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._size = 0
+
+    @staticmethod
+    def key(voice: str, text: str) -> bytes:
+        return hashlib.blake2b(f"{voice}\0{text}".encode(), digest_size=16).digest()
+
+    def get(self, key: bytes) -> bytes | None:
+        pcm = self._entries.get(key)
+        if pcm is not None:
+            self._entries.move_to_end(key)
+        return pcm
+
+    def put(self, key: bytes, pcm: bytes) -> None:
+        if len(pcm) > self._max_bytes or key in self._entries:
+            return
+        self._entries[key] = pcm
+        self._size += len(pcm)
+        while len(self._entries) > self._max_entries or self._size > self._max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+
+_pcm_cache = _PCMCache(PCM_CACHE_MAX_ENTRIES, PCM_CACHE_MAX_BYTES)
+# Both hold their loop strongly, so entries live until _close_shared() drops them.
+_sessions: dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
+# One warm-up per loop: prewarm() runs on every agent start, i.e. on every speaker handoff.
+_warmups: dict[asyncio.AbstractEventLoop, asyncio.Task[None]] = {}
+_open_instances = 0  # VoiceCloneTTS instances not yet closed; the last aclose() closes the session
+
+
+def _get_session() -> aiohttp.ClientSession:
+    """Keep-alive connection pool shared by every clone voice on the running loop."""
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        session = _sessions[loop] = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=20, limit_per_host=10, keepalive_timeout=300, ttl_dns_cache=300
+            ),
+            timeout=REQUEST_TIMEOUT,
+        )
+    return session
+
+
+async def _warm_connection() -> None:
+    """DNS + TCP + TLS to the clone endpoint; the connection then stays in the shared pool."""
+    # The endpoint only accepts POST, so this is answered with an error, but that is free and
+    # leaves the connection reusable (aiohttp does not pool connections after HEAD).
+    try:
+        async with _get_session().get(CLONE_API_URL) as response:
+            await response.read()
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.debug("[TTS] Clone endpoint warm-up failed: %s", e)
+
+
+def _warm_connection_once() -> None:
+    """Start the connection warm-up for the running loop unless it already ran."""
+    loop = asyncio.get_running_loop()
+    if loop not in _warmups:
+        _warmups[loop] = loop.create_task(_warm_connection())
+
+
+async def _close_shared() -> None:
+    """Cancel the running loop's warm-up and close its shared session."""
+    loop = asyncio.get_running_loop()
+    if (warmup := _warmups.pop(loop, None)) is not None:
+        await utils.aio.gracefully_cancel(warmup)
+    if (session := _sessions.pop(loop, None)) is not None:
+        await session.close()
+
+
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+_CLAUSE_BOUNDARY = re.compile(r"(?<=[,;])\s+")
 
 
 def _split_sentences(text: str) -> list[str]:
     """Split text into sentences for chunked generation."""
-    sentences = re.split(r'(?<=[.!?])\s+', text.strip())
-    return [s for s in sentences if s.strip()]
-
-
-def _mp3_to_pcm(mp3_bytes: bytes) -> bytes:
-    """Convert mp3 to PCM linear16, 24kHz, mono using ffmpeg."""
-    proc = subprocess.run(
-        [
-            "ffmpeg", "-i", "pipe:0",
-            "-f", "s16le",
-            "-acodec", "pcm_s16le",
-            "-ar", str(SAMPLE_RATE),
-            "-ac", str(NUM_CHANNELS),
-            "pipe:1"
-        ],
-        input=mp3_bytes,
-        capture_output=True,
-    )
-    if proc.returncode != 0:
-        raise RuntimeError(f"ffmpeg error: {proc.stderr.decode()}")
-    return proc.stdout
+    # Pieces of a stripped string split on whitespace runs are never blank, only possibly empty
+    return [s for s in _SENTENCE_BOUNDARY.split(text.strip()) if s]
+
+
+def _coalesce(sentences: list[str], min_chars: int = MIN_CHUNK_CHARS, max_chars: int = MAX_CHUNK_CHARS) -> list[str]:
+    """Merge fragments like "OK." into their neighbour and split run-ons, one request per chunk."""
+    pieces: list[str] = []
+    for sentence in sentences:
+        if len(sentence) <= max_chars:
+            pieces.append(sentence)
+            continue
+        part = ""
+        for clause in _CLAUSE_BOUNDARY.split(sentence):
+            if part and len(part) + 1 + len(clause) > max_chars:
+                pieces.append(part)
+                part = clause
+            else:
+                part = f"{part} {clause}" if part else clause
+        pieces.append(part)
+
+    chunks: list[str] = []
+    for piece in pieces:
+        if chunks and len(chunks[-1]) < min_chars and len(chunks[-1]) + 1 + len(piece) <= max_chars:
+            chunks[-1] = f"{chunks[-1]} {piece}"
+        else:
+            chunks.append(piece)
+    # Nothing follows a short last fragment, so fold it back into the chunk before it.
+    if len(chunks) > 1 and len(chunks[-1]) < min_chars and len(chunks[-2]) + 1 + len(chunks[-1]) <= max_chars:
+        chunks[-2:] = [f"{chunks[-2]} {chunks[-1]}"]
+    return chunks
+
+
+def _id3_tag_size(header: bytes) -> int:
+    """Length of a leading ID3v2 tag (0 if none), from the first 10 bytes of the file."""
+    if header[:3] != b"ID3":
+        return 0
+    size = (header[6] & 0x7F) << 21 | (header[7] & 0x7F) << 14 | (header[8] & 0x7F) << 7 | (header[9] & 0x7F)
+    return ID3_HEADER_SIZE + size + (ID3_HEADER_SIZE if header[5] & 0x10 else 0)
+
+
+class _Mp3Decoder:
+    """Incremental mp3 -> PCM linear16, 24kHz, mono decoder fed with response body chunks."""
+
+    def __init__(self) -> None:
+        self._codec = av.CodecContext.create("mp3", "r")
+        self._resampler = av.AudioResampler(format="s16", layout="mono", rate=SAMPLE_RATE)
+        self._header = b""
+        self._skip: int | None = None  # ID3 bytes still to drop; None until the header is seen
+
+    def decode(self, data: bytes) -> bytes:
+        # The raw mp3 parser cannot step over an ID3 tag, so strip it before parsing
+        if self._skip is None:
+            self._header += data
+            if len(self._header) < ID3_HEADER_SIZE:
+                return b""
+            data, self._header = self._header, b""
+            self._skip = _id3_tag_size(data)
+        return self._parse(data)
+
+    def flush(self) -> bytes:
+        # A body shorter than an ID3 header never got past buffering; it can't hold a tag
+        header, self._header = self._header, b""
+        if self._skip is None:
+            self._skip = 0
+        pcm = self._parse(header)
+        pcm += self._decode_packets([*self._codec.parse(None), None])
+        return pcm + b"".join(frame.to_ndarray().tobytes() for frame in self._resampler.resample(None))
+
+    def _parse(self, data: bytes) -> bytes:
+        if self._skip:
+            skipped = min(self._skip, len(data))
+            data = data[skipped:]
+            self._skip -= skipped
+        return self._decode_packets(self._codec.parse(data)) if data else b""
+
+    def _decode_packets(self, packets: list) -> bytes:
+        return b"".join(
+            out.to_ndarray().tobytes()
+            for packet in packets
+            for frame in self._codec.decode(packet)
+            for out in self._resampler.resample(frame)
+        )
+
+
+def _body_prefix(voice_b64: bytes | None) -> bytes:
+    """Request JSON up to the sentence text; each request appends `orjson.dumps(text) + b"}"`."""
+    # base64 needs no JSON escaping, so the (possibly megabytes) sample is spliced in as-is
+    return orjson.dumps({
+        "model": "grok-voice",
+        "response_format": "mp3",
+        "instructions": "audio",
+        "sampling_params": {
+            "max_new_tokens": 1024,
+            "temperature": 1.0,
+            "min_p": 0.01,
+        },
+    })[:-1] + b',"voice":"' + (voice_b64 or b"None") + b'","input":'
 
 
 @dataclass
 class _TTSOptions:
     voice: str
-    voice_file: str | None
-    api_key: str
+    voice_b64: bytes | None
+    body_prefix: bytes
+    headers: dict[str, str]
+    max_concurrency: int
 
 
 class VoiceCloneTTS(tts.TTS):
@@ -83,7 +286,9 @@ class VoiceCloneTTS(tts.TTS):
         *,
         voice: str = "romaco",
         api_key: str | None = None,
+        max_concurrency: int = MAX_CONCURRENT_SENTENCES,
     ) -> None:
+        global _open_instances
         super().__init__(
             capabilities=tts.TTSCapabilities(streaming=False),
             sample_rate=SAMPLE_RATE,
@@ -94,17 +299,17 @@ class VoiceCloneTTS(tts.TTS):
         if not api_key:
             raise ValueError("XAI_API_KEY not found")
 
-        voice_file = VOICE_CLONE_FILES.get(voice.lower())
-        if voice_file:
-            # Resolve relative to project root (one level up from backend/)
-            project_root = Path(__file__).parent.parent
-            voice_file = str(project_root / voice_file)
-
+        voice_b64 = _load_voice_b64(voice.lower())
         self._opts = _TTSOptions(
             voice=voice.lower(),
-            voice_file=voice_file,
-            api_key=api_key,
+            voice_b64=voice_b64,
+            body_prefix=_body_prefix(voice_b64),
+            headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
+            max_concurrency=max_concurrency,
         )
+        # The shared session outlives any one voice; it is closed with the last instance.
+        _open_instances += 1
+        self._closed = False
 
     @property
     def model(self) -> str:
@@ -117,19 +322,27 @@ class VoiceCloneTTS(tts.TTS):
     def update_options(self, *, voice: str | None = None) -> None:
         if voice:
             self._opts.voice = voice.lower()
-            voice_file = VOICE_CLONE_FILES.get(voice.lower())
-            if voice_file:
-                project_root = Path(__file__).parent.parent
-                self._opts.voice_file = str(project_root / voice_file)
+            self._opts.voice_b64 = _load_voice_b64(voice.lower())
+            self._opts.body_prefix = _body_prefix(self._opts.voice_b64)
+
+    async def aclose(self) -> None:
+        global _open_instances
+        if self._closed:
+            return
+        self._closed = True
+        _open_instances -= 1
+        if _open_instances == 0:
+            await _close_shared()
+
+    def prewarm(self) -> None:
+        """Open a keep-alive connection to the clone endpoint before the first sentence needs it."""
+        _warm_connection_once()
 
     def synthesize(
         self, text: str, *, conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS
     ) -> "VoiceCloneStream":
         return VoiceCloneStream(tts=self, input_text=text, conn_options=conn_options)
 
-    async def aclose(self) -> None:
-        pass
-
 
 class VoiceCloneStream(tts.ChunkedStream):
     def __init__(
@@ -142,78 +355,101 @@ class VoiceCloneStream(tts.ChunkedStream):
         opts = self._tts._opts
         request_id = f"xai-clone-{id(self)}"
 
-        # Cache voice base64 once
-        voice_b64 = None
-        if opts.voice_file and os.path.exists(opts.voice_file):
-            b64_start = time.perf_counter()
-            voice_b64 = _file_to_base64(opts.voice_file)
-            b64_time = time.perf_counter() - b64_start
-            if b64_time > 0.01:  # Only log if > 10ms (not cached)
-                logger.info(f"[TTS] Base64 encoding: {b64_time:.3f}s (file: {opts.voice_file})")
-
-        headers = {"Authorization": f"Bearer {opts.api_key}"}
+        voice_b64 = opts.voice_b64
+        headers = opts.headers
+        body_prefix = opts.body_prefix
 
         # Split into sentences for lower perceived latency
-        sentences = _split_sentences(self.input_text)
+        sentences = _coalesce(_split_sentences(self.input_text))
         if not sentences:
             sentences = [self.input_text]
 
-        logger.info(f"[TTS] Chunked into {len(sentences)} sentences: {sentences}")
+        logger.info("[TTS] Chunked into %d sentences: %s", len(sentences), sentences)
         total_start = time.perf_counter()
         initialized = False
 
-        for i, sentence in enumerate(sentences):
-            payload = {
-                "model": "grok-voice",
-                "input": sentence,
-                "response_format": "mp3",
-                "instructions": "audio",
-                "voice": voice_b64 or "None",
-                "sampling_params": {
-                    "max_new_tokens": 1024,
-                    "temperature": 1.0,
-                    "min_p": 0.01,
-                },
-            }
+        session = _get_session()
+        loop = asyncio.get_running_loop()
+        # Up to max_concurrency sentences are requested at once; audio is still pushed in order.
+        semaphore = asyncio.Semaphore(opts.max_concurrency)
 
+        async def _synthesize(i: int, sentence: str, audio: asyncio.Queue[bytes | None]) -> None:
             try:
-                chunk_start = time.perf_counter()
-                response = requests.post(
-                    CLONE_API_URL,
-                    json=payload,
-                    headers=headers,
-                    stream=True,
-                    timeout=30,
-                )
-                response.raise_for_status()
-                api_time = time.perf_counter() - chunk_start
-
-                mp3_bytes = b"".join(response.iter_content(chunk_size=8192))
-                
-                ffmpeg_start = time.perf_counter()
-                pcm_bytes = _mp3_to_pcm(mp3_bytes)
-                ffmpeg_time = time.perf_counter() - ffmpeg_start
-
+                cache_key = _pcm_cache.key(opts.voice if voice_b64 else "None", sentence)
+                if (cached := _pcm_cache.get(cache_key)) is not None:
+                    logger.info("[TTS] Chunk %d/%d: '%.30s...' | cached", i + 1, len(sentences), sentence)
+                    audio.put_nowait(cached)
+                    return
+
+                body = body_prefix + orjson.dumps(sentence) + b"}"
+                decoder = _Mp3Decoder()
+                parts: list[bytes] = []
+                first_audio_time = None
+
+                async with semaphore:
+                    chunk_start = time.perf_counter()
+                    async with session.post(CLONE_API_URL, data=body, headers=headers) as response:
+                        response.raise_for_status()
+                        api_time = time.perf_counter() - chunk_start
+                        # Decode while the body streams so playback can start on the first frames
+                        async for chunk in response.content.iter_any():
+                            if pcm := await loop.run_in_executor(_DECODE_POOL, decoder.decode, chunk):
+                                if first_audio_time is None:
+                                    first_audio_time = time.perf_counter() - chunk_start
+                                parts.append(pcm)
+                                audio.put_nowait(pcm)
+                    if pcm := await loop.run_in_executor(_DECODE_POOL, decoder.flush):
+                        parts.append(pcm)
+                        audio.put_nowait(pcm)
+
+                pcm_bytes = b"".join(parts)
+                _pcm_cache.put(cache_key, pcm_bytes)
                 logger.info(
-                    f"[TTS] Chunk {i+1}/{len(sentences)}: "
-                    f"'{sentence[:30]}...' | API: {api_time:.2f}s | ffmpeg: {ffmpeg_time:.3f}s | "
-                    f"audio: {len(pcm_bytes)//2//SAMPLE_RATE:.1f}s"
+                    "[TTS] Chunk %d/%d: '%.30s...' | API: %.2fs | first audio: %.2fs | total: %.2fs | audio: %.1fs",
+                    i + 1, len(sentences), sentence, api_time, first_audio_time or 0.0,
+                    time.perf_counter() - chunk_start, len(pcm_bytes) // 2 / SAMPLE_RATE,
                 )
-
-                if not initialized:
-                    output_emitter.initialize(
-                        request_id=request_id,
-                        sample_rate=SAMPLE_RATE,
-                        num_channels=NUM_CHANNELS,
-                        mime_type="audio/pcm",
-                    )
-                    initialized = True
-                    logger.info(f"[TTS] First chunk ready in {time.perf_counter() - total_start:.2f}s")
-
-                output_emitter.push(pcm_bytes)
-
-            except requests.RequestException as e:
-                raise APIConnectionError(f"Voice clone API error: {e}") from e
-            except Exception as e:
-                raise APIConnectionError(f"TTS error: {e}") from e
-
+            finally:
+                audio.put_nowait(None)
+
+        def _push(pcm_bytes: bytes) -> None:
+            nonlocal initialized
+            if not initialized:
+                output_emitter.initialize(
+                    request_id=request_id,
+                    sample_rate=SAMPLE_RATE,
+                    num_channels=NUM_CHANNELS,
+                    mime_type="audio/pcm",
+                )
+                initialized = True
+                logger.info("[TTS] First audio ready in %.2fs", time.perf_counter() - total_start)
+            output_emitter.push(pcm_bytes)
+
+        queues: list[asyncio.Queue[bytes | None]] = [asyncio.Queue() for _ in sentences]
+        tasks = [
+            asyncio.create_task(_synthesize(i, sentence, queue))
+            for i, (sentence, queue) in enumerate(zip(sentences, queues))
+        ]
+        try:
+            last = len(tasks) - 1
+            for i, (task, queue) in enumerate(zip(tasks, queues)):
+                # The last 2 ms of each sentence are held back so they can be faded out
+                # once we know no more audio follows; the next sentence fades in.
+                head, tail = i > 0, b""
+                while (pcm_bytes := await queue.get()) is not None:
+                    if head:
+                        pcm_bytes, head = _fade(pcm_bytes, fade_in=True), False
+                    pcm_bytes = tail + pcm_bytes
+                    tail, pcm_bytes = pcm_bytes[-FADE_BYTES:], pcm_bytes[:-FADE_BYTES]
+                    if pcm_bytes:
+                        _push(pcm_bytes)
+                await task  # surfaces the sentence's error, if any
+                if tail:  # a sentence under 2 ms may reach here before anything was pushed
+                    _push(tail if i == last else _fade(tail, fade_in=False))
+
+        except aiohttp.ClientError as e:
+            raise APIConnectionError(f"Voice clone API error: {e}") from e
+        except Exception as e:
+            raise APIConnectionError(f"TTS error: {e}") from e
+        finally:
+            await utils.aio.gracefully_cancel(*tasks)